@@ -14,6 +14,14 @@ NEOPIXEL_BRIGHTNESS = 0.15
 # Set to 'linux', 'mac', or 'windows' for word navigation shortcuts
 HOST_OS = "linux"
 
+# Resolved once at import so nothing compares strings at runtime;
+# unrecognized values behave like Windows
+OS_LINUX = 0
+OS_MAC = 1
+OS_WINDOWS = 2
+HOST_OS_ID = {"linux": OS_LINUX, "mac": OS_MAC, "windows": OS_WINDOWS}.get(HOST_OS.lower(), OS_WINDOWS)
+IS_MAC = HOST_OS_ID == OS_MAC
+
 # -------- Timing (seconds) --------
 KEEP_ALIVE_INTERVAL = 1.0
 SPACE_TAP_TIMEOUT = 0.300  # Increased from 175ms to 300ms for easier tapping
@@ -28,81 +36,91 @@ class Protocol:
     STATUS_HEADER = 0xA5
     HEADER2 = 0xC5
 
+# Modifier bits; import these directly on hot paths
+MOD_SHIFT = 0x01
+MOD_GREEN = 0x02
+MOD_ORANGE = 0x04
+MOD_PEOPLE = 0x08
+
 class Modifiers:
-    SHIFT = 0x01
-    GREEN = 0x02
-    ORANGE = 0x04
-    PEOPLE = 0x08
+    SHIFT = MOD_SHIFT
+    GREEN = MOD_GREEN
+    ORANGE = MOD_ORANGE
+    PEOPLE = MOD_PEOPLE
 
 # -------- LED colors --------
+COLOR_OFF = (0, 0, 0)
+COLOR_BASE = (10, 10, 40)
+COLOR_SHIFT = (80, 0, 80)
+COLOR_GREEN = (0, 100, 0)
+COLOR_ORANGE = (100, 50, 0)
+COLOR_PEOPLE = (100, 100, 100)
+COLOR_ERROR = (100, 0, 0)
+COLOR_HEARTBEAT = (30, 30, 30)
+
 class Colors:
-    OFF = (0, 0, 0)
-    BASE = (10, 10, 40)
-    SHIFT = (80, 0, 80)
-    GREEN = (0, 100, 0)
-    ORANGE = (100, 50, 0)
-    PEOPLE = (100, 100, 100)
-    ERROR = (100, 0, 0)
-    HEARTBEAT = (30, 30, 30)
+    OFF = COLOR_OFF
+    BASE = COLOR_BASE
+    SHIFT = COLOR_SHIFT
+    GREEN = COLOR_GREEN
+    ORANGE = COLOR_ORANGE
+    PEOPLE = COLOR_PEOPLE
+    ERROR = COLOR_ERROR
+    HEARTBEAT = COLOR_HEARTBEAT
 
 # -------- Chatpad raw keycodes --------
-class RawKey:
-    def __init__(self, code, name):
-        self.code = code
-        self.name = name
-
 class Keys:
     # Numbers
-    N1 = RawKey(0x17, "N1")
-    N2 = RawKey(0x16, "N2")
-    N3 = RawKey(0x15, "N3")
-    N4 = RawKey(0x14, "N4")
-    N5 = RawKey(0x13, "N5")
-    N6 = RawKey(0x12, "N6")
-    N7 = RawKey(0x11, "N7")
-    N8 = RawKey(0x67, "N8")
-    N9 = RawKey(0x66, "N9")
-    N0 = RawKey(0x65, "N0")
+    N1 = 0x17
+    N2 = 0x16
+    N3 = 0x15
+    N4 = 0x14
+    N5 = 0x13
+    N6 = 0x12
+    N7 = 0x11
+    N8 = 0x67
+    N9 = 0x66
+    N0 = 0x65
 
     # Letters - Top row
-    Q = RawKey(0x27, "Q")
-    W = RawKey(0x26, "W")
-    E = RawKey(0x25, "E")
-    R = RawKey(0x24, "R")
-    T = RawKey(0x23, "T")
-    Y = RawKey(0x22, "Y")
-    U = RawKey(0x21, "U")
-    I = RawKey(0x76, "I")
-    O = RawKey(0x75, "O")
-    P = RawKey(0x64, "P")
+    Q = 0x27
+    W = 0x26
+    E = 0x25
+    R = 0x24
+    T = 0x23
+    Y = 0x22
+    U = 0x21
+    I = 0x76
+    O = 0x75
+    P = 0x64
 
     # Letters - Home row
-    A = RawKey(0x37, "A")
-    S = RawKey(0x36, "S")
-    D = RawKey(0x35, "D")
-    F = RawKey(0x34, "F")
-    G = RawKey(0x33, "G")
-    H = RawKey(0x32, "H")
-    J = RawKey(0x31, "J")
-    K = RawKey(0x77, "K")
-    L = RawKey(0x72, "L")
+    A = 0x37
+    S = 0x36
+    D = 0x35
+    F = 0x34
+    G = 0x33
+    H = 0x32
+    J = 0x31
+    K = 0x77
+    L = 0x72
 
     # Letters - Bottom row
-    Z = RawKey(0x46, "Z")
-    X = RawKey(0x45, "X")
-    C = RawKey(0x44, "C")
-    V = RawKey(0x43, "V")
-    B = RawKey(0x42, "B")
-    N = RawKey(0x41, "N")
-    M = RawKey(0x52, "M")
+    Z = 0x46
+    X = 0x45
+    C = 0x44
+    V = 0x43
+    B = 0x42
+    N = 0x41
+    M = 0x52
 
     # Punctuation
-    COMMA = RawKey(0x62, ",")
-    PERIOD = RawKey(0x53, ".")
+    COMMA = 0x62
+    PERIOD = 0x53
 
     # Special
-    ENTER = RawKey(0x63, "ENTER")
-    SPACE = RawKey(0x54, "SPACE")
-    BACKSPACE = RawKey(0x71, "BSPC")
-    LEFT = RawKey(0x55, "LEFT")
-    RIGHT = RawKey(0x51, "RIGHT")
\ No newline at end of file
+    ENTER = 0x63
+    SPACE = 0x54
+    BACKSPACE = 0x71
+    LEFT = 0x55
+    RIGHT = 0x51
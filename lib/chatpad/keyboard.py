@@ -1,46 +1,58 @@
 """Chatpad controller that registers a KMK Module."""
-from time import monotonic
-import supervisor
+from supervisor import ticks_ms
 
 from kmk.modules import Module
 from kmk.keys import KC
+from kmk.kmktime import ticks_add, ticks_diff
 
-import config
-from config import HEARTBEAT_INTERVAL, Modifiers
+from config import HEARTBEAT_INTERVAL, SPACE_TAP_TIMEOUT, MOD_SHIFT, MOD_ORANGE, Keys
 from .protocol import UARTHandler
-from .state import ModifierState, KeyState, SpaceKeyState, DualRoleKeyState
+from .state import ModifierState, KeyState, DualRoleKeyState
 from .layers import LayerManager
 from .led import StatusLED
 from lib.macros import get_all_macros
 
+HEARTBEAT_INTERVAL_MS = int(HEARTBEAT_INTERVAL * 1000)
+SAFETY_MS = 5000  # Clear stuck modifiers after this much inactivity
+
+# Raw codes compared on every key event
+_SPACE = Keys.SPACE
+_LEFT = Keys.LEFT
+_RIGHT = Keys.RIGHT
+
 class ChatpadKMKModule(Module):
     """Integrates protocol, state, layers, and LED with KMK's loop."""
     def __init__(self, keyboard, simple_space=False):
         self.kb = keyboard
+        self._emit = keyboard.pre_process_key  # bound once for the hot path
         self.uart = UARTHandler()
         self.mods = ModifierState()
         self.keys = KeyState()
-        self.space = SpaceKeyState()
+        self.space = DualRoleKeyState(tap_timeout=SPACE_TAP_TIMEOUT)  # Space as dual-role Ctrl
         self.left_key = DualRoleKeyState(tap_timeout=0.200)  # LEFT as dual-role
         self.right_key = DualRoleKeyState(tap_timeout=0.200)  # RIGHT as dual-role
         self.macros = get_all_macros()
         self.layers = LayerManager(self.macros)
         self.led = StatusLED()
         self.shift_down = False
-        self.last_hb = monotonic()
+        self.last_hb_ms = ticks_ms()
         self.debug = False
         self.simple_space = simple_space  # Option to disable dual-role space
-        self.active_keys = {}  # raw_code -> Key object pressed
-        self.last_activity = monotonic()  # Track last key activity for safety reset
+        # (raw_code, Key) pressed per slot; the Chatpad reports at most 2 keys
+        self.active0 = None
+        self.active1 = None
+        self.safety_deadline_ms = None  # Armed by key activity for safety reset
 
     def during_bootup(self, keyboard):
         """Called once during keyboard initialization."""
         # Initialize UART and send init message during bootup
-        self.uart.maintain()
+        self.uart.maintain(ticks_ms())
         if self.debug:
             print("ChatpadKMKModule initialized")
         return
     
+    # KMK's Module base raises NotImplementedError for the hooks below, so
+    # they must stay as no-ops; process_key is inherited as a passthrough.
     def after_matrix_scan(self, keyboard):
         """Called after matrix scan."""
         return
@@ -52,189 +64,222 @@ class ChatpadKMKModule(Module):
     def after_hid_send(self, keyboard):
         """Called after HID report is sent."""
         return
-    
-    def process_key(self, keyboard, key, is_pressed, int_coord):
-        """Process key events - we pass through since we inject our own."""
-        return key
 
     def before_matrix_scan(self, keyboard):
-        # Maintain link and parse all available frames
-        self.uart.maintain()
-        report = self.uart.next_report()
-        while report:
-            self._process_report(report)
-            report = self.uart.next_report()
+        # One clock read per scan, shared by everything below
+        now = ticks_ms()
+
+        # Maintain link; keep-alives must go out even while idle
+        uart = self.uart
+        uart.maintain(now)
+
+        # Skip parsing and dual-role timers when there is nothing to do
+        if uart.has_pending or self._has_pending_timers():
+            self._poll(now)
+
+        # Safety: Clear stuck modifiers if no activity for 5 seconds
+        deadline = self.safety_deadline_ms
+        if deadline is not None and ticks_diff(now, deadline) > 0:
+            if self.active0 or self.active1 or self.shift_down or self.space.is_down:
+                # Still held; look again later
+                self.safety_deadline_ms = ticks_add(deadline, SAFETY_MS)
+            else:
+                self.safety_deadline_ms = None
+                self._safety_reset()
+
+        # LED and heartbeat
+        self.led.update_for(self.mods, now)
+        if ticks_diff(now, self.last_hb_ms) > HEARTBEAT_INTERVAL_MS:
+            self.led.heartbeat(now)
+            self.last_hb_ms = now
+
+        # Return None (no extra matrix update needed)
+        return
+
+    # Internal
+    def _arm_safety(self, now):
+        self.safety_deadline_ms = ticks_add(now, SAFETY_MS)
+
+    def _safety_reset(self):
+        if self.shift_down:
+            self._emit(KC.LSFT, False, None)
+            self.shift_down = False
+            if self.debug:
+                print("Safety: cleared stuck shift")
+        if self.space.mod_active:
+            self._emit(KC.LCTRL, False, None)
+            self.space.mod_active = False
+            self.space.is_down = False
+            if self.debug:
+                print("Safety: cleared stuck ctrl")
+        # Reset sticky states
+        if self.mods.shift_sticky:
+            self.mods.clear_sticky()
+            if self.debug:
+                print("Safety: cleared sticky shift")
+
+    def _track(self, raw, key):
+        active = self.active0
+        if active is None or active[0] == raw:
+            self.active0 = (raw, key)
+        else:
+            self.active1 = (raw, key)
+
+    def _untrack(self, raw):
+        """Forget a pressed key and return its Key object, or None."""
+        active = self.active0
+        if active is not None and active[0] == raw:
+            self.active0 = None
+            return active[1]
+        active = self.active1
+        if active is not None and active[0] == raw:
+            self.active1 = None
+            return active[1]
+        return None
+
+    def _has_pending_timers(self):
+        return self.space.is_down or self.left_key.is_down or self.right_key.is_down
+
+    def _poll(self, now):
+        """Parse all available frames and promote dual-role keys by time."""
+        process = self._process_report
+        for mods, key0, key1 in self.uart.drain_reports():
+            process(mods, key0, key1, now)
 
         # Time‑based Space promotion (only happens once when timeout is reached)
-        if not self.simple_space and self.space.promote_by_time():
-            self.kb.pre_process_key(KC.LCTRL, True, None)
+        if not self.simple_space and self.space.promote_by_time(now):
+            self._emit(KC.LCTRL, True, None)
             if self.debug:
                 print("SPACE → CTRL (timeout)")
         
         # Time-based LEFT/RIGHT key promotion
-        if self.left_key.promote_by_time():
-            if config.HOST_OS.lower() == "mac":
-                self.kb.pre_process_key(KC.LALT, True, None)
-            else:
-                self.kb.pre_process_key(KC.LALT, True, None)
+        if self.left_key.promote_by_time(now):
+            self._emit(KC.LALT, True, None)
             if self.debug:
                 print("LEFT → Alt/Option (timeout)")
                 
-        if self.right_key.promote_by_time():
-            if config.HOST_OS.lower() == "mac":
-                self.kb.pre_process_key(KC.LGUI, True, None)
-            else:
-                self.kb.pre_process_key(KC.LGUI, True, None)
+        if self.right_key.promote_by_time(now):
+            self._emit(KC.LGUI, True, None)
             if self.debug:
                 print("RIGHT → Cmd/Win (timeout)")
-        
-        # Safety: Clear stuck modifiers if no activity for 5 seconds
-        now = monotonic()
-        if self.active_keys or self.shift_down or self.space.is_down:
-            self.last_activity = now
-        elif now - self.last_activity > 5.0:
-            if self.shift_down:
-                self.kb.pre_process_key(KC.LSFT, False, None)
-                self.shift_down = False
-                if self.debug:
-                    print("Safety: cleared stuck shift")
-            if self.space.ctrl_active:
-                self.kb.pre_process_key(KC.LCTRL, False, None)
-                self.space.ctrl_active = False
-                self.space.is_down = False
-                if self.debug:
-                    print("Safety: cleared stuck ctrl")
-            # Reset sticky states
-            if self.mods.shift_sticky:
-                self.mods.shift_sticky = False
-                if self.debug:
-                    print("Safety: cleared sticky shift")
-
-        # LED and heartbeat
-        self.led.update_for(self.mods)
-        now = monotonic()
-        if now - self.last_hb > HEARTBEAT_INTERVAL:
-            self.led.heartbeat()
-            self.last_hb = now
 
-        # Return None (no extra matrix update needed)
-        return
-
-    # Internal
-    def _process_report(self, rep):
+    def _process_report(self, mods, key0, key1, now):
         # Update modifiers and handle sticky shift
-        prev_mods = self.mods.current
-        self.mods.update(rep["modifiers"])
+        rising, falling = self.mods.update(mods)
 
         # Check for shift double-tap → ESC
-        if self.mods.check_shift_double_tap():
+        if (rising | falling) & MOD_SHIFT and self.mods.check_shift_double_tap(now):
             # Send ESC on double-tap
-            self.kb.pre_process_key(KC.ESC, True, None)
-            self.kb.pre_process_key(KC.ESC, False, None)
+            self._emit(KC.ESC, True, None)
+            self._emit(KC.ESC, False, None)
             if self.debug:
                 print("SHIFT double-tap → ESC")
             # Don't process shift normally for this tap
             return
 
         # Debug toggle: press Orange while People is active
-        if self.mods.people_toggle and self.mods.rising(Modifiers.ORANGE):
+        if self.mods.people_toggle and rising & MOD_ORANGE:
             self.debug = not self.debug
             print("Debug", "ON" if self.debug else "OFF")
         
         # Caps Lock toggle: press Shift while Orange is held
-        if (self.mods.current & Modifiers.ORANGE) and self.mods.rising(Modifiers.SHIFT):
+        if (self.mods.current & MOD_ORANGE) and rising & MOD_SHIFT:
             # Send Caps Lock key press and release
-            self.kb.pre_process_key(KC.CAPS, True, None)
-            self.kb.pre_process_key(KC.CAPS, False, None)
+            self._emit(KC.CAPS, True, None)
+            self._emit(KC.CAPS, False, None)
             if self.debug:
                 print("Orange+Shift → CAPS LOCK toggle")
             # Don't process shift normally for this event
             return
 
-        # Host Shift handling
-        if self.mods.shift_active and not self.shift_down:
-            self.kb.pre_process_key(KC.LSFT, True, None)
-            self.shift_down = True
-        elif not self.mods.shift_active and self.shift_down:
-            self.kb.pre_process_key(KC.LSFT, False, None)
-            self.shift_down = False
+        # Host Shift handling: sync the host with shift_active on change only
+        shift = self.mods.shift_active
+        if shift != self.shift_down:
+            self._emit(KC.LSFT, shift, None)
+            self.shift_down = shift
+            self._arm_safety(now)
 
         # Update key state and emit events
-        self.keys.update(rep["key0"], rep["key1"])
-        for raw in self.keys.pressed():
-            self._on_key_down(raw)
-        for raw in self.keys.released():
-            self._on_key_up(raw)
-
-    def _on_key_down(self, raw):
-        # Ignore modifier raw codes; the Chatpad sends those as bits
-        if raw in (0x81, 0x82, 0x84, 0x83):
+        keys = self.keys
+        keys.update(key0, key1)
+        p0 = keys.p0
+        p1 = keys.p1
+        # Released: down in the previous frame but not now. Free their slots
+        # before tracking new presses so a held key is never overwritten;
+        # the host still sees presses first, then releases.
+        up0 = p0 and p0 != key0 and p0 != key1
+        up1 = p1 and p1 != key0 and p1 != key1
+        key_up0 = self._untrack(p0) if up0 else None
+        key_up1 = self._untrack(p1) if up1 else None
+        # Pressed: down now but not in the previous frame
+        if key0 and key0 != p0 and key0 != p1:
+            self._on_key_down(key0, now)
+        if key1 and key1 != p0 and key1 != p1:
+            self._on_key_down(key1, now)
+        if up0:
+            self._on_key_up(p0, key_up0, now)
+        if up1:
+            self._on_key_up(p1, key_up1, now)
+
+    def _on_key_down(self, raw, now):
+        # Ignore modifier raw codes (0x81-0x8F); the Chatpad sends those as
+        # bits, and every data key code is below 0x80
+        if raw & 0x80:
             return
+        self._arm_safety(now)
 
-        from config import Keys
-        
         # LEFT key handling (dual-role: tap=Left Arrow, hold=Alt/Option)
-        if raw == Keys.LEFT.code:
-            self.left_key.press()
+        if raw == _LEFT:
+            self.left_key.press(now)
             return
             
         # RIGHT key handling (dual-role: tap=Right Arrow, hold=Cmd/Win)
-        if raw == Keys.RIGHT.code:
-            self.right_key.press()
+        if raw == _RIGHT:
+            self.right_key.press(now)
             return
         
         # If LEFT is held and another key pressed, promote to Alt
         if self.left_key.promote_by_chord():
-            if config.HOST_OS.lower() == "mac":
-                self.kb.pre_process_key(KC.LALT, True, None)  # Option on Mac
-            else:
-                self.kb.pre_process_key(KC.LALT, True, None)  # Alt on Windows/Linux
+            self._emit(KC.LALT, True, None)  # Option on Mac, Alt elsewhere
                 
         # If RIGHT is held and another key pressed, promote to Cmd/Win
         if self.right_key.promote_by_chord():
-            if config.HOST_OS.lower() == "mac":
-                self.kb.pre_process_key(KC.LGUI, True, None)  # Command on Mac
-            else:
-                self.kb.pre_process_key(KC.LGUI, True, None)  # Windows key
+            self._emit(KC.LGUI, True, None)  # Command on Mac, Windows key elsewhere
         
         # Space handling
-        if raw == Keys.SPACE.code:
+        if raw == _SPACE:
             if self.simple_space:
                 # Simple space - just press it
-                self.kb.pre_process_key(KC.SPACE, True, None)
-                self.active_keys[raw] = KC.SPACE
+                self._emit(KC.SPACE, True, None)
+                self._track(raw, KC.SPACE)
                 if self.debug:
                     print("SPACE DOWN (simple)")
             else:
                 # Dual-role space
-                self.space.press()
+                self.space.press(now)
             return
 
         # If Space is held and another key goes down, promote Space to Ctrl immediately
         if not self.simple_space and self.space.promote_by_chord():
-            self.kb.pre_process_key(KC.LCTRL, True, None)
+            self._emit(KC.LCTRL, True, None)
 
         # Lookup per active layer
         key = self.layers.get_key(raw, self.mods)
         if key:
-            self.kb.pre_process_key(key, True, None)
-            self.active_keys[raw] = key
+            self._emit(key, True, None)
+            self._track(raw, key)
             if self.debug:
                 print("DOWN", hex(raw))
 
-    def _on_key_up(self, raw):
-        from config import Keys
-        import config
-        
+    def _on_key_up(self, raw, key, now):
+        """Release ``raw``; ``key`` is what _untrack returned for it."""
+        self._arm_safety(now)
         # LEFT key release
-        if raw == Keys.LEFT.code:
+        if raw == _LEFT:
             was_tap, was_hold = self.left_key.release()
             if was_hold:
                 # Release Alt/Option
-                if config.HOST_OS.lower() == "mac":
-                    self.kb.pre_process_key(KC.LALT, False, None)
-                else:
-                    self.kb.pre_process_key(KC.LALT, False, None)
+                self._emit(KC.LALT, False, None)
             elif was_tap:
                 # Send Left Arrow
                 self.kb.tap_key(KC.LEFT)
@@ -243,14 +288,11 @@ class ChatpadKMKModule(Module):
             return
             
         # RIGHT key release  
-        if raw == Keys.RIGHT.code:
+        if raw == _RIGHT:
             was_tap, was_hold = self.right_key.release()
             if was_hold:
                 # Release Cmd/Win
-                if config.HOST_OS.lower() == "mac":
-                    self.kb.pre_process_key(KC.LGUI, False, None)
-                else:
-                    self.kb.pre_process_key(KC.LGUI, False, None)
+                self._emit(KC.LGUI, False, None)
             elif was_tap:
                 # Send Right Arrow
                 self.kb.tap_key(KC.RIGHT)
@@ -258,19 +300,17 @@ class ChatpadKMKModule(Module):
                 print("RIGHT tap" if was_tap else "Cmd/Win release" if was_hold else "")
             return
         
-        if raw == Keys.SPACE.code:
+        if raw == _SPACE:
             if self.simple_space:
                 # Simple space release
-                self.kb.pre_process_key(KC.SPACE, False, None)
-                if raw in self.active_keys:
-                    del self.active_keys[raw]
+                self._emit(KC.SPACE, False, None)
                 if self.debug:
                     print("SPACE UP (simple)")
             else:
                 # Dual-role space
                 was_space, was_ctrl = self.space.release()
                 if was_ctrl:
-                    self.kb.pre_process_key(KC.LCTRL, False, None)
+                    self._emit(KC.LCTRL, False, None)
                 elif was_space:
                     if self.debug:
                         print(f"Sending SPACE via tap_key, KC.SPACE={KC.SPACE}")
@@ -279,12 +319,11 @@ class ChatpadKMKModule(Module):
                     print("SPACE tap" if was_space else "CTRL rel")
             return
 
-        key = self.active_keys.pop(raw, None)
         if not key:
             # Fallback to current layer if not tracked
             key = self.layers.get_key(raw, self.mods)
         if key:
-            self.kb.pre_process_key(key, False, None)
+            self._emit(key, False, None)
             if self.debug:
                 print("UP  ", hex(raw))
 
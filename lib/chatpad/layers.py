@@ -1,182 +1,225 @@
 """Layer selection and key mappings."""
-from config import Keys, Modifiers, HOST_OS
+from kmk.keys import KC
+
+from config import Keys, HOST_OS_ID, OS_WINDOWS, IS_MAC
 
 class LayerManager:
     def __init__(self, macros):
         self.macros = macros
-        self.layers = {}
-        self._layers_built = False
-        # Don't build layers yet - KC.MACRO won't exist until Macros module is loaded
+        # Flat lookup tables indexed by ModifierState.layer_index, then by raw
+        # code. Each slot is filled once with an immutable tuple and never
+        # replaced. Layers other than base are built on first use: KC.MACRO won't
+        # exist until the Macros module is loaded, and unused layers never
+        # cost any RAM.
+        self._tables = [None, None, None, None]
+        self._builders = (
+            self._build_base,
+            self._build_green,
+            self._build_orange,
+            self._build_people,
+        )
+        # Every session types on base, so build it at boot rather than on
+        # the first keypress
+        self._build(0)
+
+    def _build(self, index):
+        # The source dict is dropped once expanded, so each layer is held in
+        # memory exactly once. Chatpad key codes fit in 7 bits, so get_key
+        # is two subscripts with no hashing; the table is a fixed-size tuple
+        # since it never changes after this.
+        layer = self._builders[index]()
+        table = [None] * 128
+        for code, key in layer.items():
+            table[code & 0x7F] = key
+        table = tuple(table)
+        self._tables[index] = table
+        return table
 
-    def _build_layers(self):
-        # Only build once
-        if self._layers_built:
-            return
-        
-        from kmk.keys import KC
-        
+    def _build_base(self):
         # Base typing layer
-        base = {}
-        # Letters
-        for key in [
-            Keys.Q, Keys.W, Keys.E, Keys.R, Keys.T, Keys.Y, Keys.U, Keys.I, Keys.O, Keys.P,
-            Keys.A, Keys.S, Keys.D, Keys.F, Keys.G, Keys.H, Keys.J, Keys.K, Keys.L,
-            Keys.Z, Keys.X, Keys.C, Keys.V, Keys.B, Keys.N, Keys.M
-        ]:
-            base[key.code] = getattr(KC, key.name)
-        # Numbers
-        nums = [Keys.N1, Keys.N2, Keys.N3, Keys.N4, Keys.N5, Keys.N6, Keys.N7, Keys.N8, Keys.N9, Keys.N0]
-        for idx, key in enumerate(nums, 1):
-            base[key.code] = getattr(KC, "N{}".format(idx % 10))
-        # Punctuation and specials
-        base[Keys.COMMA.code] = KC.COMMA
-        base[Keys.PERIOD.code] = KC.DOT
-        base[Keys.SPACE.code] = KC.SPACE
-        base[Keys.ENTER.code] = KC.ENTER
-        base[Keys.BACKSPACE.code] = KC.BSPC
-        base[Keys.LEFT.code] = KC.LEFT
-        base[Keys.RIGHT.code] = KC.RIGHT
+        return {
+            # Numbers
+            Keys.N1: KC.N1,
+            Keys.N2: KC.N2,
+            Keys.N3: KC.N3,
+            Keys.N4: KC.N4,
+            Keys.N5: KC.N5,
+            Keys.N6: KC.N6,
+            Keys.N7: KC.N7,
+            Keys.N8: KC.N8,
+            Keys.N9: KC.N9,
+            Keys.N0: KC.N0,
+            # Letters - Top row
+            Keys.Q: KC.Q,
+            Keys.W: KC.W,
+            Keys.E: KC.E,
+            Keys.R: KC.R,
+            Keys.T: KC.T,
+            Keys.Y: KC.Y,
+            Keys.U: KC.U,
+            Keys.I: KC.I,
+            Keys.O: KC.O,
+            Keys.P: KC.P,
+            # Letters - Home row
+            Keys.A: KC.A,
+            Keys.S: KC.S,
+            Keys.D: KC.D,
+            Keys.F: KC.F,
+            Keys.G: KC.G,
+            Keys.H: KC.H,
+            Keys.J: KC.J,
+            Keys.K: KC.K,
+            Keys.L: KC.L,
+            # Letters - Bottom row
+            Keys.Z: KC.Z,
+            Keys.X: KC.X,
+            Keys.C: KC.C,
+            Keys.V: KC.V,
+            Keys.B: KC.B,
+            Keys.N: KC.N,
+            Keys.M: KC.M,
+            # Punctuation and specials
+            Keys.COMMA: KC.COMMA,
+            Keys.PERIOD: KC.DOT,
+            Keys.SPACE: KC.SPACE,
+            Keys.ENTER: KC.ENTER,
+            Keys.BACKSPACE: KC.BSPC,
+            Keys.LEFT: KC.LEFT,
+            Keys.RIGHT: KC.RIGHT,
+        }
 
+    def _build_green(self):
         # Green: symbols layer (hold green button + key)
-        green = {
-            Keys.Q.code: KC.EXCLAIM,      # Q = !
-            Keys.W.code: KC.AT,           # W = @
-            Keys.E.code: KC.DOLLAR,       # E = $
-            Keys.R.code: KC.HASH,         # R = #
-            Keys.T.code: KC.PERCENT,      # T = %
-            Keys.Y.code: KC.CIRCUMFLEX,   # Y = ^
-            Keys.U.code: KC.AMPERSAND,    # U = &
-            Keys.I.code: KC.ASTERISK,     # I = *
-            Keys.O.code: KC.LPRN,         # O = (
-            Keys.P.code: KC.RPRN,         # P = )
-            Keys.A.code: KC.TILDE,        # A = ~
+        return {
+            Keys.Q: KC.EXCLAIM,      # Q = !
+            Keys.W: KC.AT,           # W = @
+            Keys.E: KC.DOLLAR,       # E = $
+            Keys.R: KC.HASH,         # R = #
+            Keys.T: KC.PERCENT,      # T = %
+            Keys.Y: KC.CIRCUMFLEX,   # Y = ^
+            Keys.U: KC.AMPERSAND,    # U = &
+            Keys.I: KC.ASTERISK,     # I = *
+            Keys.O: KC.LPRN,         # O = (
+            Keys.P: KC.RPRN,         # P = )
+            Keys.A: KC.TILDE,        # A = ~
             # S = None
-            Keys.D.code: KC.LCBR,         # D = {
-            Keys.F.code: KC.RCBR,         # F = }
+            Keys.D: KC.LCBR,         # D = {
+            Keys.F: KC.RCBR,         # F = }
             # G = None
-            Keys.H.code: KC.SLASH,        # H = /
-            Keys.J.code: KC.QUOTE,        # J = '
-            Keys.K.code: KC.LBRC,         # K = [
-            Keys.L.code: KC.RBRC,         # L = ]
-            Keys.COMMA.code: KC.COLON,    # , = :
-            Keys.Z.code: KC.GRV,          # Z = `
+            Keys.H: KC.SLASH,        # H = /
+            Keys.J: KC.QUOTE,        # J = '
+            Keys.K: KC.LBRC,         # K = [
+            Keys.L: KC.RBRC,         # L = ]
+            Keys.COMMA: KC.COLON,    # , = :
+            Keys.Z: KC.GRV,          # Z = `
             # X = None
             # C = None
-            Keys.V.code: KC.MINUS,        # V = -
-            Keys.B.code: KC.PIPE,         # B = |
-            Keys.N.code: KC.LABK,         # N = <
-            Keys.M.code: KC.RABK,         # M = >
-            Keys.PERIOD.code: KC.QUESTION, # . = ?
+            Keys.V: KC.MINUS,        # V = -
+            Keys.B: KC.PIPE,         # B = |
+            Keys.N: KC.LABK,         # N = <
+            Keys.M: KC.RABK,         # M = >
+            Keys.PERIOD: KC.QUESTION, # . = ?
         }
 
+    def _build_orange(self):
         # Orange: secondary symbols and special keys (hold orange button + key)
-        orange = {
+        return {
             # Most keys are None except for these:
-            Keys.P.code: KC.EQUAL,         # P = =
-            Keys.H.code: KC.BSLASH,        # H = \
-            Keys.J.code: KC.DQUO,          # J = "
-            Keys.COMMA.code: KC.SCOLON,    # , = ;
-            Keys.V.code: KC.UNDS,          # V = _
-            Keys.B.code: KC.PLUS,          # B = +
+            Keys.P: KC.EQUAL,         # P = =
+            Keys.H: KC.BSLASH,        # H = \
+            Keys.J: KC.DQUO,          # J = "
+            Keys.COMMA: KC.SCOLON,    # , = ;
+            Keys.V: KC.UNDS,          # V = _
+            Keys.B: KC.PLUS,          # B = +
             # Keep function keys on number row for convenience
-            Keys.N1.code: KC.F1,
-            Keys.N2.code: KC.F2,
-            Keys.N3.code: KC.F3,
-            Keys.N4.code: KC.F4,
-            Keys.N5.code: KC.F5,
-            Keys.N6.code: KC.F6,
-            Keys.N7.code: KC.F7,
-            Keys.N8.code: KC.F8,
-            Keys.N9.code: KC.F9,
-            Keys.N0.code: KC.F10,
+            Keys.N1: KC.F1,
+            Keys.N2: KC.F2,
+            Keys.N3: KC.F3,
+            Keys.N4: KC.F4,
+            Keys.N5: KC.F5,
+            Keys.N6: KC.F6,
+            Keys.N7: KC.F7,
+            Keys.N8: KC.F8,
+            Keys.N9: KC.F9,
+            Keys.N0: KC.F10,
             # Additional function keys on unused keys (F/G unused in spec)
-            Keys.F.code: KC.F11,
-            Keys.G.code: KC.F12,
+            Keys.F: KC.F11,
+            Keys.G: KC.F12,
             # Navigation keys (arrows on dedicated arrow keys)
-            Keys.LEFT.code: KC.LEFT,
-            Keys.RIGHT.code: KC.RIGHT,
+            Keys.LEFT: KC.LEFT,
+            Keys.RIGHT: KC.RIGHT,
             # Additional arrow cluster on WASD for convenience
-            Keys.W.code: KC.UP,
-            Keys.A.code: KC.LEFT,
-            Keys.S.code: KC.DOWN,
-            Keys.D.code: KC.RIGHT,
+            Keys.W: KC.UP,
+            Keys.A: KC.LEFT,
+            Keys.S: KC.DOWN,
+            Keys.D: KC.RIGHT,
             # Tab and untab
-            Keys.T.code: KC.TAB,
-            Keys.Y.code: KC.LSFT(KC.TAB),  # Shift+Tab for untab
+            Keys.T: KC.TAB,
+            Keys.Y: KC.LSFT(KC.TAB),  # Shift+Tab for untab
             # ESC easily accessible
-            Keys.Q.code: KC.ESC,
+            Keys.Q: KC.ESC,
             # Caps lock toggle is now on Orange+Shift (handled in keyboard.py)
         }
 
+    def _build_people(self):
         # People: dev shortcuts and navigation
-        if HOST_OS.lower() in ("linux", "mac"):
-            word_left = KC.LALT(KC.LEFT)
-            word_right = KC.LALT(KC.RIGHT)
+        # Same keycodes on every OS: Command/Windows key and Option/Alt
+        gui_key = KC.LGUI
+        alt_key = KC.LALT
+        ctl_key = KC.LCTL
+        MACRO = KC.MACRO
+        macros = self.macros
+
+        if HOST_OS_ID != OS_WINDOWS:
+            word_left = alt_key(KC.LEFT)
+            word_right = alt_key(KC.RIGHT)
         else:
-            word_left = KC.LCTL(KC.LEFT)
-            word_right = KC.LCTL(KC.RIGHT)
+            word_left = ctl_key(KC.LEFT)
+            word_right = ctl_key(KC.RIGHT)
 
-        # Select appropriate GUI/Alt key based on OS
-        if HOST_OS.lower() == "mac":
-            gui_key = KC.LGUI  # Command key on macOS
-            alt_key = KC.LALT  # Option key on macOS
+        # Clipboard modifier: Command on macOS, Ctrl elsewhere
+        if IS_MAC:
+            clip_mod = gui_key
+            redo = gui_key(KC.LSFT(KC.Z))
         else:
-            gui_key = KC.LGUI  # Windows key on Windows/Linux
-            alt_key = KC.LALT  # Alt key
+            clip_mod = ctl_key
+            redo = ctl_key(KC.Y)
 
-        people = {
+        return {
             # Arrows on IJKL
-            Keys.I.code: KC.UP,
-            Keys.K.code: KC.DOWN,
-            Keys.J.code: KC.LEFT,
-            Keys.L.code: KC.RIGHT,
+            Keys.I: KC.UP,
+            Keys.K: KC.DOWN,
+            Keys.J: KC.LEFT,
+            Keys.L: KC.RIGHT,
             # Home/End
-            Keys.COMMA.code: KC.HOME,
-            Keys.PERIOD.code: KC.END,
+            Keys.COMMA: KC.HOME,
+            Keys.PERIOD: KC.END,
             # Word navigation
-            Keys.H.code: word_left,
-            Keys.U.code: word_right,
+            Keys.H: word_left,
+            Keys.U: word_right,
             # Modifier keys
-            Keys.A.code: alt_key,   # Alt/Option on A
-            Keys.W.code: gui_key,   # Command/Win on W
+            Keys.A: alt_key,   # Alt/Option on A
+            Keys.W: gui_key,   # Command/Win on W
             # Macros - wrap with KC.MACRO()
-            Keys.T.code: KC.MACRO(self.macros["tmux_prefix"]),
-            Keys.K.code: KC.MACRO(self.macros["clear"]),  # Changed from C to K
-            Keys.G.code: KC.MACRO(self.macros["git_status"]),
-            Keys.S.code: KC.MACRO(self.macros["save"]),
-            Keys.B.code: KC.MACRO(self.macros["build"]),
+            Keys.T: MACRO(macros["tmux_prefix"]),
+            Keys.K: MACRO(macros["clear"]),  # Changed from C to K
+            Keys.G: MACRO(macros["git_status"]),
+            Keys.S: MACRO(macros["save"]),
+            Keys.B: MACRO(macros["build"]),
             # Clipboard operations (use OS-appropriate modifier)
-            Keys.C.code: KC.LCTL(KC.C) if HOST_OS.lower() != "mac" else KC.LGUI(KC.C),  # Copy
-            Keys.X.code: KC.LCTL(KC.X) if HOST_OS.lower() != "mac" else KC.LGUI(KC.X),  # Cut
-            Keys.V.code: KC.LCTL(KC.V) if HOST_OS.lower() != "mac" else KC.LGUI(KC.V),  # Paste
-            Keys.Z.code: KC.LCTL(KC.Z) if HOST_OS.lower() != "mac" else KC.LGUI(KC.Z),  # Undo
-            Keys.Y.code: KC.LCTL(KC.Y) if HOST_OS.lower() != "mac" else KC.LGUI(KC.LSFT(KC.Z)),  # Redo
+            Keys.C: clip_mod(KC.C),  # Copy
+            Keys.X: clip_mod(KC.X),  # Cut
+            Keys.V: clip_mod(KC.V),  # Paste
+            Keys.Z: clip_mod(KC.Z),  # Undo
+            Keys.Y: redo,            # Redo
             # Quick close
-            Keys.Q.code: KC.LALT(KC.F4),
+            Keys.Q: alt_key(KC.F4),
             # Additional vim-friendly ESC option
-            Keys.E.code: KC.ESC,
+            Keys.E: KC.ESC,
         }
 
-        self.layers = {
-            "base": base,
-            "green": green,
-            "orange": orange,
-            "people": people,
-        }
-        self._layers_built = True
-
-    def select(self, modifiers):
-        # Build layers if not already built (deferred until KC.MACRO exists)
-        if not self._layers_built:
-            self._build_layers()
-            
-        if modifiers.people_toggle:
-            return self.layers["people"]
-        if modifiers.orange_active:
-            return self.layers["orange"]
-        if modifiers.green_active:
-            return self.layers["green"]
-        return self.layers["base"]
-
     def get_key(self, raw_code, modifiers):
-        return self.select(modifiers).get(raw_code)
\ No newline at end of file
+        table = self._tables[modifiers.layer_index]
+        if table is None:
+            table = self._build(modifiers.layer_index)
+        return table[raw_code & 0x7F]
@@ -1,6 +1,10 @@
 """NeoPixel status LED helper with pulsing layer indication."""
-from config import NEOPIXEL_PIN, NEOPIXEL_BRIGHTNESS, Colors
-from time import monotonic
+from config import (
+    NEOPIXEL_PIN, NEOPIXEL_BRIGHTNESS, COLOR_BASE, COLOR_SHIFT, COLOR_GREEN,
+    COLOR_ORANGE, COLOR_PEOPLE, COLOR_ERROR
+)
+from supervisor import ticks_ms
+from kmk.kmktime import ticks_add, ticks_diff
 import math
 
 try:
@@ -9,71 +13,81 @@ try:
 except Exception:
     LED_OK = False
 
+# One 2 second pulse cycle as 64 brightness steps (0.3 to 1.0, scaled to 255)
+_PULSE_STEPS = 64
+_PULSE_STEP_MS = 2000 // _PULSE_STEPS
+_PULSE_LUT = bytes(
+    int(255 * (0.65 + 0.35 * math.sin(2 * math.pi * i / _PULSE_STEPS)))
+    for i in range(_PULSE_STEPS)
+)
+
 class StatusLED:
     def __init__(self):
         self.enabled = LED_OK
-        self.base_color = Colors.BASE
-        self.current_layer_color = Colors.BASE
+        self.current_layer_color = COLOR_BASE
         self.pulse_phase = 0
-        self.last_update = monotonic()
+        self.mods_version = -1  # ModifierState.version the color was picked for
+        self.last_update = ticks_ms()
+        self._last_rgb = COLOR_BASE  # what the pixel is showing right now
         if self.enabled:
             self.px = neopixel.NeoPixel(NEOPIXEL_PIN, 1, brightness=NEOPIXEL_BRIGHTNESS, auto_write=False)
-            self.px[0] = Colors.BASE
+            self.px[0] = COLOR_BASE
             self.px.show()
 
     def set(self, rgb):
         if not self.enabled:
             return
-        self.base_color = rgb
         self.current_layer_color = rgb
 
-    def update_for(self, modifiers):
+    def update_for(self, modifiers, now):
         if not self.enabled:
             return
         
-        # Determine base color from layer
-        if modifiers.people_toggle:
-            self.set(Colors.PEOPLE)
-        elif modifiers.green_active:
-            self.set(Colors.GREEN)
-        elif modifiers.orange_active:
-            self.set(Colors.ORANGE)
-        elif modifiers.shift_active:
-            self.set(Colors.SHIFT)
-        else:
-            self.set(Colors.BASE)
+        # Determine base color from layer (only when the modifiers changed)
+        if modifiers.version != self.mods_version:
+            self.mods_version = modifiers.version
+            if modifiers.people_toggle:
+                self.set(COLOR_PEOPLE)
+            elif modifiers.green_active:
+                self.set(COLOR_GREEN)
+            elif modifiers.orange_active:
+                self.set(COLOR_ORANGE)
+            elif modifiers.shift_active:
+                self.set(COLOR_SHIFT)
+            else:
+                self.set(COLOR_BASE)
         
         # Apply pulsing effect
-        self.pulse()
+        self.pulse(now)
 
-    def pulse(self):
-        """Create a pulsing effect for current layer color."""
+    def pulse(self, now):
+        """Create a pulsing effect for current layer color at ticks ``now``."""
         if not self.enabled:
             return
         
-        now = monotonic()
-        dt = now - self.last_update
-        self.last_update = now
-        
-        # Update pulse phase (0 to 2*pi over 2 seconds)
-        self.pulse_phase += dt * math.pi  # Full cycle in 2 seconds
-        if self.pulse_phase > 2 * math.pi:
-            self.pulse_phase -= 2 * math.pi
+        # Advance the pulse phase by whole LUT steps (full cycle in 2 seconds)
+        steps = ticks_diff(now, self.last_update) // _PULSE_STEP_MS
+        if steps:
+            self.pulse_phase = (self.pulse_phase + steps) % _PULSE_STEPS
+            self.last_update = ticks_add(self.last_update, steps * _PULSE_STEP_MS)
         
-        # Calculate brightness multiplier (0.3 to 1.0)
-        brightness = 0.65 + 0.35 * math.sin(self.pulse_phase)
-        
-        # Apply brightness to current color
+        # Apply brightness to current color with integer math only
+        level = _PULSE_LUT[self.pulse_phase]
         r, g, b = self.current_layer_color
-        self.px[0] = (int(r * brightness), int(g * brightness), int(b * brightness))
-        self.px.show()
+        rgb = ((r * level) >> 8, (g * level) >> 8, (b * level) >> 8)
+        # show() blocks with interrupts off, so only push actual changes
+        if rgb != self._last_rgb:
+            self._last_rgb = rgb
+            self.px[0] = rgb
+            self.px.show()
     
-    def heartbeat(self):
+    def heartbeat(self, now):
         # Keep for compatibility, but pulsing replaces this
-        self.pulse()
+        self.pulse(now)
 
     def error(self):
         if not self.enabled:
             return
-        self.px[0] = Colors.ERROR
+        self._last_rgb = COLOR_ERROR
+        self.px[0] = COLOR_ERROR
         self.px.show()
\ No newline at end of file
@@ -1,53 +1,110 @@
 """UART protocol handler for Xbox 360 Chatpad."""
 import busio
-from time import monotonic
+from supervisor import ticks_ms
+from kmk.kmktime import ticks_add, ticks_diff
 from config import (
     Protocol, UART_TX_PIN, UART_RX_PIN, UART_BAUDRATE,
     UART_BUFFER_SIZE, KEEP_ALIVE_INTERVAL
 )
 
+KEEP_ALIVE_INTERVAL_MS = int(KEEP_ALIVE_INTERVAL * 1000)
+
+# Most bytes buffered before the oldest are dropped
+_CAPACITY = UART_BUFFER_SIZE * 2
+
+# Ring buffer size: a power of two holding at least _CAPACITY
+_RING_SIZE = 8
+while _RING_SIZE < _CAPACITY:
+    _RING_SIZE <<= 1
+_RING_MASK = _RING_SIZE - 1
+
+# Protocol bytes as module constants, read into locals by the parse loop
+_FRAME_SIZE = Protocol.FRAME_SIZE
+_STATUS_HEADER = Protocol.STATUS_HEADER
+_DATA_HEADER = Protocol.DATA_HEADER
+_HEADER2 = Protocol.HEADER2
+
+
 class FrameParser:
-    """Accumulates bytes and yields validated frames."""
+    """Accumulates bytes and yields validated frames.
+
+    Bytes live in a preallocated ring, so consuming them only moves
+    ``head``; nothing is copied or allocated until a valid frame is found.
+    """
 
     def __init__(self):
-        self.buffer = bytearray()
+        self.ring = bytearray(_RING_SIZE)
+        self.head = 0   # index of the oldest buffered byte
+        self.count = 0  # number of buffered bytes
 
     def add_data(self, data):
-        if data:
-            self.buffer.extend(data)
-            if len(self.buffer) > UART_BUFFER_SIZE * 2:
-                # keep recent bytes only
-                self.buffer = self.buffer[-UART_BUFFER_SIZE:]
+        if not data:
+            return
+        n = len(data)
+        data = memoryview(data)
+        if self.count + n > _CAPACITY:
+            # keep the most recent _CAPACITY bytes: drop only what overflows
+            if n >= _CAPACITY:
+                data = data[n - _CAPACITY:]
+                n = _CAPACITY
+                self.count = 0
+            else:
+                drop = self.count + n - _CAPACITY
+                self.head = (self.head + drop) & _RING_MASK
+                self.count -= drop
+        # copy in at the tail, wrapping around the end of the ring
+        ring = self.ring
+        tail = (self.head + self.count) & _RING_MASK
+        first = min(n, _RING_SIZE - tail)
+        ring[tail:tail + first] = data[:first]
+        if first < n:
+            ring[:n - first] = data[first:]
+        self.count += n
 
     def get_frame(self):
         """Return next 8‑byte valid data frame or None."""
-        while len(self.buffer) >= Protocol.FRAME_SIZE:
-            # skip status frames
-            if self.buffer[0] == Protocol.STATUS_HEADER:
-                self.buffer = self.buffer[Protocol.FRAME_SIZE:]
-                continue
-            # look for data header
-            if self.buffer[0] == Protocol.DATA_HEADER:
-                if len(self.buffer) < Protocol.FRAME_SIZE:
-                    return None
-                if self.buffer[1] != Protocol.HEADER2:
-                    self.buffer = self.buffer[1:]
-                    continue
-                frame = bytes(self.buffer[:Protocol.FRAME_SIZE])
-                if self._checksum_ok(frame):
-                    self.buffer = self.buffer[Protocol.FRAME_SIZE:]
-                    return frame
-                # bad checksum, resync by one byte
-                self.buffer = self.buffer[1:]
-                continue
-            # unknown, drop a byte
-            self.buffer = self.buffer[1:]
-        return None
+        ring = self.ring
+        head = self.head
+        count = self.count
+        fs = _FRAME_SIZE
+        status = _STATUS_HEADER
+        data = _DATA_HEADER
+        header2 = _HEADER2
+        mask = _RING_MASK
+        frame = None
+        while count >= fs:
+            first = ring[head]
+            if first == status:
+                # skip status frames
+                step = fs
+            elif (first == data
+                  and ring[(head + 1) & mask] == header2
+                  and self._checksum_ok(ring, head)):
+                end = head + fs
+                if end <= _RING_SIZE:
+                    frame = bytes(ring[head:end])
+                else:
+                    frame = bytes(ring[head:]) + bytes(ring[:end - _RING_SIZE])
+                head = end & mask
+                count -= fs
+                break
+            else:
+                # bad header or checksum, or unknown: resync by one byte
+                step = 1
+            head = (head + step) & mask
+            count -= step
+        self.head = head
+        self.count = count
+        return frame
 
     @staticmethod
-    def _checksum_ok(frame):
-        s = sum(frame[:7]) & 0xFF
-        return ((-s) & 0xFF) == frame[7]
+    def _checksum_ok(ring, off):
+        """Check the frame starting at ring[off] without copying it."""
+        m = _RING_MASK
+        s = (ring[off] + ring[(off + 1) & m] + ring[(off + 2) & m]
+             + ring[(off + 3) & m] + ring[(off + 4) & m] + ring[(off + 5) & m]
+             + ring[(off + 6) & m]) & 0xFF
+        return ((-s) & 0xFF) == ring[(off + 7) & m]
 
 
 class UARTHandler:
@@ -59,18 +116,24 @@ class UARTHandler:
             baudrate=UART_BAUDRATE, timeout=0, receiver_buffer_size=UART_BUFFER_SIZE
         )
         self.parser = FrameParser()
-        self.last_ping = 0.0
+        # Backdated so the first maintain() sends a keep-alive right away
+        self.last_ping = ticks_add(ticks_ms(), -KEEP_ALIVE_INTERVAL_MS - 1)
         self.uart.write(Protocol.INIT_MSG)
 
-    def maintain(self):
-        now = monotonic()
-        if now - self.last_ping > KEEP_ALIVE_INTERVAL:
+    @property
+    def has_pending(self):
+        """Truthy when the UART has unread bytes or the parser holds a full frame."""
+        return self.uart.in_waiting or self.parser.count >= _FRAME_SIZE
+
+    def maintain(self, now):
+        """Send a keep-alive if one is due; ``now`` is a ticks_ms() value."""
+        if ticks_diff(now, self.last_ping) > KEEP_ALIVE_INTERVAL_MS:
             self.uart.write(Protocol.AWAKE_MSG)
             self.last_ping = now
 
     def next_report(self):
-        """Return dict {'modifiers','key0','key1'} or None."""
-        iw = getattr(self.uart, "in_waiting", 0)
+        """Return a (modifiers, key0, key1) tuple or None."""
+        iw = self.uart.in_waiting
         if iw:
             data = self.uart.read(iw)
             # Debug: Enable to see raw UART data
@@ -81,4 +144,12 @@ class UARTHandler:
             return None
         # Debug: Enable to see parsed frames
         # print(f"Frame: {' '.join(hex(b) for b in frame)}")
-        return {"modifiers": frame[3], "key0": frame[4], "key1": frame[5]}
\ No newline at end of file
+        return frame[3], frame[4], frame[5]
+
+    def drain_reports(self, limit=8):
+        """Yield up to ``limit`` reports; the rest wait for the next scan."""
+        for _ in range(limit):
+            report = self.next_report()
+            if report is None:
+                return
+            yield report
\ No newline at end of file
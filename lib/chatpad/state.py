@@ -1,6 +1,9 @@
-"""State machines for modifiers, keys, and Space dual‑role."""
-from time import monotonic
-from config import Modifiers, SPACE_TAP_TIMEOUT
+"""State machines for modifiers, keys, and dual‑role keys."""
+from kmk.kmktime import ticks_diff
+from config import MOD_SHIFT, MOD_GREEN, MOD_ORANGE, MOD_PEOPLE
+
+# Layer index by the Green/Orange bits (mods >> 1) & 3; Orange wins over Green
+_LAYER_BY_COLOR = (0, 1, 2, 2)
 
 class ModifierState:
     def __init__(self):
@@ -8,21 +11,48 @@ class ModifierState:
         self.previous = 0
         self.shift_sticky = False
         self.people_toggle = False
+        # Derived flags, recomputed whenever current or shift_sticky changes
+        self.shift_active = False
+        self.green_active = False
+        self.orange_active = False
+        # Index into LayerManager tables: 0=base, 1=green, 2=orange, 3=people
+        self.layer_index = 0
+        # Bumped whenever anything derived from the modifiers may change
+        self.version = 0
         # Double-tap detection for Shift → ESC
-        self.shift_last_release = 0.0
-        self.shift_double_tap_window = 0.3  # 300ms window for double-tap
+        self.shift_last_release = None
+        self.shift_double_tap_window = 300  # ms window for double-tap
 
     def update(self, new_mods):
-        self.previous = self.current
+        """Store a new modifier byte and return its (rising, falling) masks."""
+        self.previous = old = self.current
+        if new_mods == old:
+            # Nothing changed: no edges, same layer
+            return 0, 0
         self.current = new_mods
+        self.version += 1
         # Rising edge on People toggles dev layer
-        if self.rising(Modifiers.PEOPLE):
+        if self.rising(MOD_PEOPLE):
             self.people_toggle = not self.people_toggle
         # Sticky Shift toggled by Shift+Orange chord rising
-        chord = (self.current & Modifiers.SHIFT) and (self.current & Modifiers.ORANGE)
-        chord_prev = (self.previous & Modifiers.SHIFT) and (self.previous & Modifiers.ORANGE)
+        chord = (self.current & MOD_SHIFT) and (self.current & MOD_ORANGE)
+        chord_prev = (self.previous & MOD_SHIFT) and (self.previous & MOD_ORANGE)
         if chord and not chord_prev:
             self.shift_sticky = not self.shift_sticky
+        self.shift_active = self.shift_sticky or bool(new_mods & MOD_SHIFT)
+        self.green_active = bool(new_mods & MOD_GREEN)
+        self.orange_active = bool(new_mods & MOD_ORANGE)
+        # Resolve the active layer once per change instead of per key
+        if self.people_toggle:
+            self.layer_index = 3
+        else:
+            self.layer_index = _LAYER_BY_COLOR[(new_mods >> 1) & 3]
+        return new_mods & ~old, old & ~new_mods
+
+    def clear_sticky(self):
+        self.shift_sticky = False
+        self.shift_active = bool(self.current & MOD_SHIFT)
+        self.version += 1
 
     def rising(self, mask):
         return (self.current & mask) and not (self.previous & mask)
@@ -30,101 +60,49 @@ class ModifierState:
     def falling(self, mask):
         return not (self.current & mask) and (self.previous & mask)
     
-    def check_shift_double_tap(self):
+    def check_shift_double_tap(self, now):
         """Check if shift was double-tapped. Returns True if ESC should be sent."""
-        if self.rising(Modifiers.SHIFT):
-            now = monotonic()
-            # Check if this is the second tap within the window
-            if now - self.shift_last_release < self.shift_double_tap_window:
+        if self.rising(MOD_SHIFT):
+            last = self.shift_last_release
+            # Check if this is the second tap within the window. ticks_diff
+            # goes negative once the release is ~74 hours old, so check both
+            # ends of the window.
+            if last is not None and 0 <= ticks_diff(now, last) < self.shift_double_tap_window:
                 # Double-tap detected!
-                self.shift_last_release = 0.0  # Reset to prevent triple-tap
+                self.shift_last_release = None  # Reset to prevent triple-tap
                 return True
-        elif self.falling(Modifiers.SHIFT):
+        elif self.falling(MOD_SHIFT):
             # Record when shift was released
-            self.shift_last_release = monotonic()
+            self.shift_last_release = now
         return False
 
-    @property
-    def shift_active(self):
-        return self.shift_sticky or bool(self.current & Modifiers.SHIFT)
-
-    @property
-    def green_active(self):
-        return bool(self.current & Modifiers.GREEN)
-
-    @property
-    def orange_active(self):
-        return bool(self.current & Modifiers.ORANGE)
-
 
 class KeyState:
+    """The two key slots of the current and previous frame, as plain ints."""
     def __init__(self):
-        self.current = [0, 0]
-        self.previous = [0, 0]
+        self.c0 = 0
+        self.c1 = 0
+        self.p0 = 0
+        self.p1 = 0
 
     def update(self, k0, k1):
-        self.previous = self.current[:]
-        self.current = [k0, k1]
-
-    def pressed(self):
-        out = []
-        for k in self.current:
-            if k and k not in self.previous:
-                out.append(k)
-        return out
-
-    def released(self):
-        out = []
-        for k in self.previous:
-            if k and k not in self.current:
-                out.append(k)
-        return out
-
-
-class SpaceKeyState:
-    """Dual‑role Space: tap Space or hold/chord to Ctrl."""
-    def __init__(self):
-        self.is_down = False
-        self.down_at = 0.0
-        self.ctrl_active = False
-
-    def press(self):
-        self.is_down = True
-        self.down_at = monotonic()
-        self.ctrl_active = False
-
-    def release(self):
-        was_ctrl = self.ctrl_active
-        was_space = self.is_down and not self.ctrl_active
-        self.is_down = False
-        self.ctrl_active = False
-        return was_space, was_ctrl
-
-    def promote_by_time(self):
-        if self.is_down and not self.ctrl_active:
-            if monotonic() - self.down_at > SPACE_TAP_TIMEOUT:
-                self.ctrl_active = True
-                return True
-        return False
-
-    def promote_by_chord(self):
-        if self.is_down and not self.ctrl_active:
-            self.ctrl_active = True
-            return True
-        return False
+        self.p0 = self.c0
+        self.p1 = self.c1
+        self.c0 = k0
+        self.c1 = k1
 
 
 class DualRoleKeyState:
-    """Generic dual-role key: tap for one action, hold for modifier."""
+    """Dual-role key (Space, LEFT, RIGHT): tap for one action, hold for modifier."""
     def __init__(self, tap_timeout=0.200):
         self.is_down = False
-        self.down_at = 0.0
+        self.down_at = 0
         self.mod_active = False
-        self.tap_timeout = tap_timeout
+        self.tap_timeout_ms = int(tap_timeout * 1000)
 
-    def press(self):
+    def press(self, now):
         self.is_down = True
-        self.down_at = monotonic()
+        self.down_at = now
         self.mod_active = False
 
     def release(self):
@@ -134,9 +112,9 @@ class DualRoleKeyState:
         self.mod_active = False
         return was_tap, was_mod
 
-    def promote_by_time(self):
+    def promote_by_time(self, now):
         if self.is_down and not self.mod_active:
-            if monotonic() - self.down_at > self.tap_timeout:
+            if ticks_diff(now, self.down_at) > self.tap_timeout_ms:
                 self.mod_active = True
                 return True
         return False
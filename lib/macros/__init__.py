@@ -4,23 +4,20 @@ from .terminal import term_macros
 from .vim import vim_macros
 
 def get_all_macros():
-    out = {}
+    from kmk.keys import KC
+    from kmk.modules.macros import Tap
+    # Pair insertion defaults (insert pair and move caret left); the macro
+    # modules below override any of these they define
+    left = Tap(KC.LEFT)
+    out = {
+        "pair_paren": ["()", left],
+        "pair_brace": ["{}", left],
+        "pair_bracket": ["[]", left],
+        "pair_angle": ["<>", left],
+        "pair_squote": ["''", left],
+        "pair_dquote": ['""', left],
+    }
     out.update(dev_macros())
     out.update(term_macros())
     out.update(vim_macros())
-    # Pair insertion defaults if any are missing
-    ensure = {
-        "pair_paren": "()",
-        "pair_brace": "{}",
-        "pair_bracket": "[]",
-        "pair_angle": "<>",
-        "pair_squote": "''",
-        "pair_dquote": '""',
-    }
-    from kmk.keys import KC
-    from kmk.modules.macros import Tap
-    for name, s in ensure.items():
-        if name not in out:
-            # Insert pair and move caret left
-            out[name] = [s, Tap(KC.LEFT)]
-    return out
\ No newline at end of file
+    return out